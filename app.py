@@ -1,6 +1,10 @@
 from flask import Flask, request, abort, jsonify
 import requests
+import orjson
+from requests.adapters import HTTPAdapter
 import os
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 import hmac
 import hashlib
 import logging
@@ -8,6 +12,7 @@ from datetime import datetime
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json.sort_keys = False
 
 # Configure logging
 logging.basicConfig(
@@ -21,42 +26,205 @@ TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 GITHUB_WEBHOOK_SECRET = os.getenv('GITHUB_WEBHOOK_SECRET')
 
-def verify_github_signature(payload_body, signature_header):
-    """Verify GitHub webhook signature using HMAC-SHA256"""
+# Derived config, computed once since env vars don't change after startup
+_SECRET_BYTES = (GITHUB_WEBHOOK_SECRET or "").encode()
+_TG_CONFIGURED = bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID)
+
+# 'sha256=' prefix plus 64 hex chars
+GITHUB_SIGNATURE_LENGTH = 71
+
+# Read size when hashing the incoming webhook body
+PAYLOAD_CHUNK_SIZE = 65536
+
+# Shared HTTP session so Telegram calls reuse pooled keep-alive connections.
+# The send URL is built once; the token is masked in logged request errors.
+_TG_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+_SESSION.headers["Content-Type"] = "application/json"
+atexit.register(_SESSION.close)
+
+# Constant sendMessage fields; each send copies this and adds its text
+_BASE_PAYLOAD = {
+    "chat_id": TELEGRAM_CHAT_ID,
+    "parse_mode": "Markdown",
+    "disable_web_page_preview": True
+}
+# Same fields minus parse_mode, for the plain-text fallback
+_PLAIN_PAYLOAD = {
+    key: value for key, value in _BASE_PAYLOAD.items() if key != "parse_mode"
+}
+
+# Telegram caps messages at 4096 chars; leave headroom for Markdown entities
+TELEGRAM_MESSAGE_LIMIT = 4000
+
+# Commit notification layout, parsed once and filled with str.format_map
+_COMMIT_TMPL = (
+    "📌 *New Commit to {repo}*\n"
+    "━━━━━━━━━━━━━━━\n"
+    "👤 *Author*: {author}\n"
+    "🔹 *Branch*: `{branch}`\n"
+    "💬 *Message*: _{message}_\n"
+    "━━━━━━━━━━━━━━━\n"
+    "🔗 [View Commit ↗]({url})"
+)
+
+# Background executor so webhook responses don't wait on Telegram delivery
+_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='telegram')
+atexit.register(_POOL.shutdown)
+
+def read_verified_payload(payload_stream, signature_header):
+    """Read the webhook body, verifying its HMAC-SHA256 signature as it streams in
+
+    Returns the raw body bytes, or None if the signature doesn't match.
+    """
     if not GITHUB_WEBHOOK_SECRET:
         logger.error("Webhook secret not configured")
-        return False
-        
-    secret = GITHUB_WEBHOOK_SECRET.encode()
-    expected_signature = hmac.new(secret, payload_body, hashlib.sha256).hexdigest()
-    expected_header = f'sha256={expected_signature}'
-    return hmac.compare_digest(expected_header, signature_header)
+        return None
+
+    # Header length and prefix are public, so reject malformed ones before hashing
+    if (not signature_header
+            or len(signature_header) != GITHUB_SIGNATURE_LENGTH
+            or not signature_header.startswith('sha256=')):
+        return None
+
+    try:
+        provided = bytes.fromhex(signature_header[7:])
+    except ValueError:
+        return None
+
+    digest = hmac.new(_SECRET_BYTES, b'', hashlib.sha256)
+    body_chunks = []
+    while chunk := payload_stream.read(PAYLOAD_CHUNK_SIZE):
+        digest.update(chunk)
+        body_chunks.append(chunk)
 
-def send_telegram_message(text):
+    if not hmac.compare_digest(digest.digest(), provided):
+        return None
+    return b''.join(body_chunks)
+
+def redact_token(text):
+    """Mask the bot token, which requests embeds in URLs in its error messages"""
+    return text.replace(TELEGRAM_BOT_TOKEN, '***') if TELEGRAM_BOT_TOKEN else text
+
+def send_telegram_message(text, markdown=True):
     """Send message to Telegram with error handling"""
-    if not all([TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID]):
+    if not _TG_CONFIGURED:
         logger.error("Telegram credentials not configured")
         return False
 
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": text,
-        "parse_mode": "Markdown",
-        "disable_web_page_preview": True
-    }
-    
+    payload = (_BASE_PAYLOAD if markdown else _PLAIN_PAYLOAD).copy()
+    payload["text"] = text
+
     try:
-        response = requests.post(url, json=payload, timeout=10)
+        response = _SESSION.post(_TG_URL, data=orjson.dumps(payload), timeout=10)
         response.raise_for_status()
         logger.info("Telegram message sent successfully")
         return True
+    except requests.exceptions.HTTPError as e:
+        # Unbalanced Markdown in any commit message rejects the whole batch,
+        # so resend it as plain text rather than losing every notification
+        if markdown and "can't parse entities" in e.response.text:
+            logger.warning("Telegram rejected Markdown, resending as plain text")
+            return send_telegram_message(text, markdown=False)
+        logger.error(f"Telegram API error: {redact_token(str(e))}")
+        logger.error(f"Telegram API response: {e.response.text}")
+        return False
     except requests.exceptions.RequestException as e:
-        logger.error(f"Telegram API error: {str(e)}")
-        if hasattr(e, 'response') and e.response:
-            logger.error(f"Telegram API response: {e.response.text}")
+        logger.error(f"Telegram API error: {redact_token(str(e))}")
         return False
 
+def batch_messages(parts, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Join message parts into as few Telegram messages as fit under the limit"""
+    batches = []
+    current = []
+    length = 0
+    # Split any single part that is longer than a whole message
+    pieces = (part[i:i + limit] for part in parts for i in range(0, len(part), limit))
+    for part in pieces:
+        # Account for the blank-line separator between parts
+        added = len(part) + (2 if current else 0)
+        if current and length + added > limit:
+            batches.append("\n\n".join(current))
+            current = []
+            added = len(part)
+            length = 0
+        current.append(part)
+        length += added
+    if current:
+        batches.append("\n\n".join(current))
+    return batches
+
+def deliver_commit_messages(messages):
+    """Deliver a push's batched notifications to Telegram in order"""
+    sent = sum(1 for message in messages if send_telegram_message(message))
+    if sent != len(messages):
+        logger.error(f"Delivered {sent}/{len(messages)} Telegram messages")
+
+def log_delivery_failure(future):
+    """Log errors raised inside a background delivery task"""
+    error = future.exception()
+    if error is not None:
+        logger.error(f"Telegram delivery task failed: {redact_token(str(error))}",
+                     exc_info=error)
+
+def json_response(obj, status=200):
+    """Serialize a JSON response body with orjson"""
+    return orjson.dumps(obj), status, {'Content-Type': 'application/json'}
+
+def _handle_ping(data):
+    """Answer GitHub's ping event sent when a webhook is created"""
+    logger.info("Received ping event")
+    return json_response({"status": "pong", "zen": data.get('zen', '')})
+
+def _handle_push(data):
+    """Queue Telegram notifications for the commits in a push event"""
+    # Push payloads always carry these fields, so index them directly
+    commits = data['commits']
+    branch = data['ref'].rpartition('/')[2]
+    repo_name = data['repository']['name']
+
+    if not commits:
+        logger.info("Push event with no commits")
+        return json_response({"status": "ignored", "reason": "No commits"})
+
+    messages = []
+    results = []
+    for commit in commits:
+        try:
+            message = _COMMIT_TMPL.format_map({
+                "repo": repo_name,
+                "author": commit.get('author', {}).get('name', 'Unknown'),
+                "branch": branch,
+                "message": commit.get('message', 'No message'),
+                "url": commit.get('url', '#')
+            })
+            logger.debug("Formatted message: %s", message)
+
+            messages.append(message)
+            results.append({"commit_id": commit.get('id'), "status": "queued"})
+        except Exception as commit_error:
+            logger.error(f"Error processing commit: {str(commit_error)}")
+            results.append({"commit_id": commit.get('id'), "status": "error"})
+
+    if messages:
+        # One task per push keeps its batches in order and under the chat rate limit
+        future = _POOL.submit(deliver_commit_messages, batch_messages(messages))
+        future.add_done_callback(log_delivery_failure)
+
+    return json_response({
+        "status": "processed",
+        "repo": repo_name,
+        "branch": branch,
+        "results": results
+    })
+
+# GitHub event type -> handler, looked up once per webhook
+_HANDLERS = {
+    'push': _handle_push,
+    'ping': _handle_ping
+}
+
 @app.route('/')
 def health_check():
     """Root endpoint with service information"""
@@ -77,7 +245,7 @@ def deep_health_check():
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
         "components": {
-            "telegram": bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID),
+            "telegram": _TG_CONFIGURED,
             "github_webhook": bool(GITHUB_WEBHOOK_SECRET),
             "system_time": datetime.utcnow().isoformat()
         }
@@ -88,7 +256,8 @@ def github_webhook():
     """Handle GitHub webhook events"""
     # Log incoming request
     logger.info(f"Incoming webhook request from IP: {request.remote_addr}")
-    logger.debug(f"Request headers: {dict(request.headers)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Request headers: %s", dict(request.headers))
 
     # Verify signature
     signature = request.headers.get('X-Hub-Signature-256')
@@ -96,71 +265,32 @@ def github_webhook():
         logger.error("Missing X-Hub-Signature-256 header")
         abort(400, "Missing signature header")
 
-    if not verify_github_signature(request.data, signature):
+    payload_body = read_verified_payload(request.stream, signature)
+    if payload_body is None:
         logger.error("Invalid webhook signature")
         abort(403, "Invalid signature")
 
+    try:
+        data = orjson.loads(payload_body) if payload_body else None
+    except orjson.JSONDecodeError:
+        logger.error("Malformed JSON payload")
+        abort(400, "Invalid JSON payload")
+
     # Process payload
     try:
-        data = request.get_json()
         if not data:
             logger.warning("Empty payload received")
-            return jsonify({"status": "ignored", "reason": "Empty payload"}), 200
+            return json_response({"status": "ignored", "reason": "Empty payload"})
 
         event_type = request.headers.get('X-GitHub-Event', 'unknown')
         logger.info(f"Processing {event_type} event")
 
-        # Handle ping event
-        if event_type == 'ping':
-            logger.info("Received ping event")
-            return jsonify({"status": "pong", "zen": data.get('zen', '')}), 200
-
-        # Handle push event
-        if event_type == 'push':
-            repo = data.get('repository', {})
-            commits = data.get('commits', [])
-            branch = data.get('ref', '').split('/')[-1]
-            pusher = data.get('pusher', {}).get('name', 'Unknown')
-
-            if not commits:
-                logger.info("Push event with no commits")
-                return jsonify({"status": "ignored", "reason": "No commits"}), 200
-
-            results = []
-            for commit in commits:
-                try:
-                    message = (
-                        f"📌 *New Commit to {repo.get('name', 'Unnamed Repository')}*\n"
-                        f"━━━━━━━━━━━━━━━\n"
-                        f"👤 *Author*: {commit.get('author', {}).get('name', 'Unknown')}\n"
-                        f"🔹 *Branch*: `{branch}`\n"
-                        f"💬 *Message*: _{commit.get('message', 'No message')}_\n"
-                        f"━━━━━━━━━━━━━━━\n"
-                        f"🔗 [View Commit ↗]({commit.get('url', '#')})"
-                    )
-                    logger.debug(f"Formatted message: {message}")
-
-                    if send_telegram_message(message):
-                        results.append({"commit_id": commit.get('id'), "status": "sent"})
-                    else:
-                        results.append({"commit_id": commit.get('id'), "status": "failed"})
-                except Exception as commit_error:
-                    logger.error(f"Error processing commit: {str(commit_error)}")
-                    results.append({"commit_id": commit.get('id'), "status": "error"})
-
-            return jsonify({
-                "status": "processed",
-                "repo": repo.get('name'),
-                "branch": branch,
-                "results": results
-            }), 200
-
-        logger.warning(f"Unhandled event type: {event_type}")
-        return jsonify({"status": "ignored", "reason": f"Unhandled event type: {event_type}"}), 200
+        handler = _HANDLERS.get(event_type)
+        if handler is None:
+            logger.warning(f"Unhandled event type: {event_type}")
+            return json_response({"status": "ignored", "reason": f"Unhandled event type: {event_type}"})
+        return handler(data)
 
     except Exception as e:
         logger.error(f"Webhook processing failed: {str(e)}", exc_info=True)
         abort(500, "Internal server error")
-
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=int(os.getenv('PORT', 10000)))
\ No newline at end of file